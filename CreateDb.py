@@ -1,4 +1,196 @@
 import sqlite3
+from email.utils import parseaddr, parsedate_tz, mktime_tz
+from functools import lru_cache
+
+# One row per normalized sender, kept up to date by the triggers below so
+# reports never have to scan the emails table.
+SENDER_STATS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS sender_stats (
+        sender_key TEXT PRIMARY KEY,
+        sender TEXT,
+        total INTEGER NOT NULL DEFAULT 0,
+        important INTEGER NOT NULL DEFAULT 0,
+        not_important INTEGER NOT NULL DEFAULT 0,
+        reviewed INTEGER NOT NULL DEFAULT 0,
+        with_unsubscribe_link INTEGER NOT NULL DEFAULT 0,
+        unsubscribe_url TEXT,
+        oldest_ts INTEGER,
+        newest_ts INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_sender_stats_total ON sender_stats (total DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_sender_stats_not_important ON sender_stats (not_important DESC)",
+    # Holds a row while a bulk write counts some emails into sender_stats itself (see pause_sender_stats)
+    "CREATE TABLE IF NOT EXISTS sender_stats_paused (from_rowid INTEGER)",
+]
+
+# Trigger condition: skip the emails a bulk write is counting itself
+TRIGGERS_ACTIVE = "NOT EXISTS (SELECT 1 FROM sender_stats_paused WHERE {row}.rowid >= from_rowid)"
+
+# Statements shared by the triggers: count a row in, or count it back out.
+# sender and unsubscribe_url keep the MAX seen, like rebuild_sender_stats.
+# Removing a row can't undo them or oldest_ts/newest_ts; the app never deletes
+# emails, and `main.py stats --rebuild` recomputes them if needed.
+ADD_NEW_ROW = """
+    INSERT INTO sender_stats (
+        sender_key, sender, total, important, not_important, reviewed,
+        with_unsubscribe_link, unsubscribe_url, oldest_ts, newest_ts
+    )
+    VALUES (
+        IFNULL(NEW.sender_key, ''), NEW.sender, 1,
+        NEW.category IS 'IMPORTANT', NEW.category IS 'NOT IMPORTANT', NEW.reviewed IS 1,
+        IFNULL(NEW.unsubscribe_url, '') != '', NULLIF(NEW.unsubscribe_url, ''),
+        NEW.date_ts, NEW.date_ts
+    )
+    ON CONFLICT (sender_key) DO UPDATE SET
+        sender = MAX(IFNULL(sender, excluded.sender), IFNULL(excluded.sender, sender)),
+        total = total + 1,
+        important = important + excluded.important,
+        not_important = not_important + excluded.not_important,
+        reviewed = reviewed + excluded.reviewed,
+        with_unsubscribe_link = with_unsubscribe_link + excluded.with_unsubscribe_link,
+        unsubscribe_url = MAX(IFNULL(unsubscribe_url, excluded.unsubscribe_url), IFNULL(excluded.unsubscribe_url, unsubscribe_url)),
+        oldest_ts = MIN(IFNULL(oldest_ts, excluded.oldest_ts), IFNULL(excluded.oldest_ts, oldest_ts)),
+        newest_ts = MAX(IFNULL(newest_ts, excluded.newest_ts), IFNULL(excluded.newest_ts, newest_ts));
+"""
+
+REMOVE_OLD_ROW = """
+    UPDATE sender_stats SET
+        total = total - 1,
+        important = important - (OLD.category IS 'IMPORTANT'),
+        not_important = not_important - (OLD.category IS 'NOT IMPORTANT'),
+        reviewed = reviewed - (OLD.reviewed IS 1),
+        with_unsubscribe_link = with_unsubscribe_link - (IFNULL(OLD.unsubscribe_url, '') != '')
+    WHERE sender_key = IFNULL(OLD.sender_key, '');
+    DELETE FROM sender_stats WHERE sender_key = IFNULL(OLD.sender_key, '') AND total <= 0;
+"""
+
+# Keyed by name and written the way SQLite stores them (without IF NOT EXISTS),
+# so upgrade_db can tell when an existing trigger is out of date
+SENDER_STATS_TRIGGERS = {
+    "sender_stats_insert": f"""CREATE TRIGGER sender_stats_insert AFTER INSERT ON emails
+WHEN {TRIGGERS_ACTIVE.format(row="NEW")}
+BEGIN
+{ADD_NEW_ROW}
+END""",
+
+    "sender_stats_delete": f"""CREATE TRIGGER sender_stats_delete AFTER DELETE ON emails
+WHEN {TRIGGERS_ACTIVE.format(row="OLD")}
+BEGIN
+{REMOVE_OLD_ROW}
+END""",
+
+    # Classifying or reviewing an email keeps its sender: apply the difference in place
+    "sender_stats_update": f"""CREATE TRIGGER sender_stats_update
+AFTER UPDATE OF sender, category, reviewed, unsubscribe_url, sender_key, date_ts ON emails
+WHEN IFNULL(OLD.sender_key, '') = IFNULL(NEW.sender_key, '') AND {TRIGGERS_ACTIVE.format(row="OLD")}
+BEGIN
+    UPDATE sender_stats SET
+        sender = MAX(IFNULL(sender, NEW.sender), IFNULL(NEW.sender, sender)),
+        important = important + (NEW.category IS 'IMPORTANT') - (OLD.category IS 'IMPORTANT'),
+        not_important = not_important + (NEW.category IS 'NOT IMPORTANT') - (OLD.category IS 'NOT IMPORTANT'),
+        reviewed = reviewed + (NEW.reviewed IS 1) - (OLD.reviewed IS 1),
+        with_unsubscribe_link = with_unsubscribe_link
+            + (IFNULL(NEW.unsubscribe_url, '') != '') - (IFNULL(OLD.unsubscribe_url, '') != ''),
+        unsubscribe_url = MAX(IFNULL(unsubscribe_url, NULLIF(NEW.unsubscribe_url, '')), IFNULL(NULLIF(NEW.unsubscribe_url, ''), unsubscribe_url)),
+        oldest_ts = MIN(IFNULL(oldest_ts, NEW.date_ts), IFNULL(NEW.date_ts, oldest_ts)),
+        newest_ts = MAX(IFNULL(newest_ts, NEW.date_ts), IFNULL(NEW.date_ts, newest_ts))
+    WHERE sender_key = IFNULL(NEW.sender_key, '');
+END""",
+
+    "sender_stats_move": f"""CREATE TRIGGER sender_stats_move
+AFTER UPDATE OF sender, category, reviewed, unsubscribe_url, sender_key, date_ts ON emails
+WHEN IFNULL(OLD.sender_key, '') != IFNULL(NEW.sender_key, '') AND {TRIGGERS_ACTIVE.format(row="OLD")}
+BEGIN
+{REMOVE_OLD_ROW}
+{ADD_NEW_ROW}
+END""",
+}
+
+SENDER_STATS_COLUMNS = """
+    sender_key, sender, total, important, not_important, reviewed,
+    with_unsubscribe_link, unsubscribe_url, oldest_ts, newest_ts
+"""
+
+# One sender_stats row per sender for the emails selected by {source}
+SENDER_TOTALS = """
+    SELECT
+        IFNULL(sender_key, ''),
+        MAX(sender),
+        COUNT(*),
+        SUM(category IS 'IMPORTANT'),
+        SUM(category IS 'NOT IMPORTANT'),
+        SUM(reviewed IS 1),
+        SUM(IFNULL(unsubscribe_url, '') != ''),
+        MAX(NULLIF(unsubscribe_url, '')),
+        MIN(date_ts),
+        MAX(date_ts)
+    FROM ({source})
+    WHERE true
+    GROUP BY IFNULL(sender_key, '')
+"""
+
+# Recomputes every sender_stats row with one scan of the emails table
+REBUILD_SENDER_STATS = f"""
+    INSERT INTO sender_stats ({SENDER_STATS_COLUMNS})
+    {SENDER_TOTALS.format(source="SELECT * FROM emails")}
+"""
+
+# ADD_NEW_ROW for many emails at once, one upsert per sender
+COUNT_SENDER_STATS = f"""
+    INSERT INTO sender_stats ({SENDER_STATS_COLUMNS})
+    {SENDER_TOTALS}
+    ON CONFLICT (sender_key) DO UPDATE SET
+        sender = MAX(IFNULL(sender, excluded.sender), IFNULL(excluded.sender, sender)),
+        total = total + excluded.total,
+        important = important + excluded.important,
+        not_important = not_important + excluded.not_important,
+        reviewed = reviewed + excluded.reviewed,
+        with_unsubscribe_link = with_unsubscribe_link + excluded.with_unsubscribe_link,
+        unsubscribe_url = MAX(IFNULL(unsubscribe_url, excluded.unsubscribe_url), IFNULL(excluded.unsubscribe_url, unsubscribe_url)),
+        oldest_ts = MIN(IFNULL(oldest_ts, excluded.oldest_ts), IFNULL(excluded.oldest_ts, oldest_ts)),
+        newest_ts = MAX(IFNULL(newest_ts, excluded.newest_ts), IFNULL(excluded.newest_ts, newest_ts))
+"""
+
+def pause_sender_stats(cursor, from_rowid=-2**63):
+    """
+    Turn the per-row sender_stats triggers off, until resume_sender_stats,
+    for emails with a rowid of at least `from_rowid` (by default all of them),
+    so a bulk write can count them per sender with count_sender_stats instead.
+    Call both inside the same transaction: other connections never see the
+    triggers paused, and a rollback turns them back on.
+    """
+    cursor.execute("INSERT INTO sender_stats_paused VALUES (?)", (from_rowid,))
+
+def resume_sender_stats(cursor):
+    cursor.execute("DELETE FROM sender_stats_paused")
+
+def count_sender_stats(cursor, source, **params):
+    """Add the emails selected by the SQL query `source` (with `params`) to sender_stats."""
+    cursor.execute(COUNT_SENDER_STATS.format(source=source), params)
+
+@lru_cache(maxsize=65536)  # most mail comes from a few senders
+def normalize_sender(sender):
+    """Key used to group emails by sender: the lowercased address, e.g. 'news@shop.com'."""
+    if not sender:
+        return ""
+    # Fast path for the usual 'Name <address>' form
+    start = sender.rfind("<")
+    if start != -1 and sender.endswith(">") and "@" in sender[start:]:
+        return sender[start + 1:-1].strip().lower()
+    address = parseaddr(sender)[1]
+    return (address or sender).strip().lower()
+
+def parse_date_ts(date):
+    """Unix timestamp of a Date header, or None if it can't be parsed."""
+    if not date:
+        return None
+    try:
+        parsed = parsedate_tz(date)
+        return mktime_tz(parsed) if parsed else None
+    except (ValueError, OverflowError):
+        return None
 
 def create_db(db_name="emails.db"):
     conn = sqlite3.connect(db_name)
@@ -14,10 +206,76 @@ def create_db(db_name="emails.db"):
         snippet TEXT,
         category TEXT,
         unsubscribe_url TEXT,
-        reviewed INTEGER DEFAULT 0
+        reviewed INTEGER DEFAULT 0,
+        sender_key TEXT,
+        date_ts INTEGER
     )
     """)
 
     conn.commit()
     conn.close()
+    upgrade_db(db_name)
     print(f"Database '{db_name}' created with table 'emails'")
+
+def upgrade_db(db_name="emails.db"):
+    """
+    Bring a database from an older version up to date: add the sender_key and
+    date_ts columns, create sender_stats and its triggers, and build the
+    stats from the existing emails. Everything happens in one transaction, so
+    an interrupted upgrade leaves the database as it was.
+    Does nothing if the database is already up to date.
+    """
+
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    try:
+        conn.execute("BEGIN TRANSACTION")
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(emails)")}
+        if "sender_key" not in columns:
+            cursor.execute("ALTER TABLE emails ADD COLUMN sender_key TEXT")
+        if "date_ts" not in columns:
+            cursor.execute("ALTER TABLE emails ADD COLUMN date_ts INTEGER")
+
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='sender_stats'")
+        stats_missing = cursor.fetchone() is None
+        if stats_missing:
+            rows = cursor.execute("SELECT id, sender, date FROM emails WHERE sender_key IS NULL").fetchall()
+            cursor.executemany(
+                "UPDATE emails SET sender_key = ?, date_ts = ? WHERE id = ?",
+                [(normalize_sender(sender), parse_date_ts(date), email_id) for email_id, sender, date in rows]
+            )
+
+        # Triggers from an older version may have kept the stats differently: replace them and rebuild
+        existing = dict(cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='trigger' AND tbl_name='emails'"))
+        outdated = [name for name, sql in SENDER_STATS_TRIGGERS.items() if existing.get(name) != sql]
+        if stats_missing or outdated:
+            for statement in SENDER_STATS_SCHEMA:
+                cursor.execute(statement)
+        for name in outdated:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(SENDER_STATS_TRIGGERS[name])
+
+        if stats_missing or outdated:
+            cursor.execute("DELETE FROM sender_stats")
+            cursor.execute(REBUILD_SENDER_STATS)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def rebuild_sender_stats(db_name="emails.db"):
+    """Recompute sender_stats from scratch with one scan of the emails table."""
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    try:
+        conn.execute("BEGIN TRANSACTION")
+        cursor.execute("DELETE FROM sender_stats")
+        cursor.execute(REBUILD_SENDER_STATS)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,314 @@
+"""
+Headless runner for several Gmail accounts.
+
+Every account runs sync, classify, sort and the unsubscribe export in its own
+worker process, with its own token, database and Gmail rate limiter. All
+workers share one global budget of concurrent Gemini calls. A worker that
+crashes or is killed only fails its own account.
+
+Manifest (JSON):
+    {
+        "workers": 4,
+        "llm_concurrency": 2,
+        "accounts": [
+            {"name": "work"},
+            {"name": "personal", "trash": true, "gmail_rate": 20}
+        ]
+    }
+
+"workers" caps the number of accounts running at once (default: 4).
+
+Per-account keys (all optional except name):
+    dir          folder for the account's files (default: accounts/<name>)
+    token        OAuth token file (default: <dir>/token.json)
+    credentials  OAuth client file (default: credentials.json)
+    db           SQLite database (default: <dir>/emails.db)
+    gmail_rate   max Gmail calls per second (default: 40)
+    sort         label NOT IMPORTANT emails for review (default: true)
+    trash        also move them to Trash (default: false)
+
+Usage:
+    python MultiAccount.py accounts.json --authorize work   # one-time browser login
+    python MultiAccount.py accounts.json --summary summary.json
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+import traceback
+from multiprocessing.connection import wait
+
+from connectGmail import gmail_service
+from CreateDb import create_db, upgrade_db
+from SortMail import (
+    get_or_create_label,
+    fetch_not_important_ids,
+    move_to_trash,
+    label_not_important,
+    mark_as_reviewed
+)
+from Stats import get_mailbox_stats
+from StoreMail import RateLimiter
+from Unsubscribe import get_unsubscribe_links, export_to_csv
+from main import sync_emails, classify_all
+
+# -----------------------
+# CONFIG
+# -----------------------
+ACCOUNTS_DIR = "accounts"
+DEFAULT_WORKERS = 4
+DEFAULT_LLM_CONCURRENCY = 2
+LLM_SLOT_TIMEOUT = 600  # seconds to wait for a Gemini slot before going ahead without one
+DEFAULT_GMAIL_RATE = 40
+MAX_CLASSIFY_ERRORS = 5  # failed chunks in a row before an account stops classifying
+
+# "stored" counts every email written by the sync, including ones already in the database
+SUMMARY_COLUMNS = ["stored", "classified", "important", "not_important", "labeled", "trashed", "unsubscribe_links"]
+
+
+def load_manifest(path):
+    """Read the account manifest and fill in the per-account defaults."""
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    accounts = manifest.get("accounts") or []
+    if not accounts:
+        raise ValueError(f"No accounts found in '{path}'")
+
+    names = set()
+    for account in accounts:
+        name = account.get("name")
+        if not name:
+            raise ValueError("Every account in the manifest needs a 'name'")
+        if name in names:
+            raise ValueError(f"Duplicate account name '{name}'")
+        names.add(name)
+
+        account.setdefault("dir", os.path.join(ACCOUNTS_DIR, name))
+        account.setdefault("token", os.path.join(account["dir"], "token.json"))
+        account.setdefault("credentials", manifest.get("credentials", "credentials.json"))
+        account.setdefault("db", os.path.join(account["dir"], "emails.db"))
+        account.setdefault("gmail_rate", manifest.get("gmail_rate", DEFAULT_GMAIL_RATE))
+        account.setdefault("sort", True)
+        account.setdefault("trash", False)
+
+    return manifest
+
+
+def sort_account(service, account, rate_limiter=None):
+    """Label NOT IMPORTANT emails for review and, if enabled, move them to Trash."""
+    db = account["db"]
+    label_id = get_or_create_label(service, rate_limiter=rate_limiter)
+    if not label_id:
+        raise RuntimeError("Failed to get or create review label")
+
+    non_important_ids = fetch_not_important_ids(db=db)
+    labeled = label_not_important(service, label_id, db=db, rate_limiter=rate_limiter) if non_important_ids else 0
+    trashed = 0
+    if labeled:
+        mark_as_reviewed(non_important_ids, db=db)
+        if account["trash"]:
+            trashed = move_to_trash(service, non_important_ids, rate_limiter=rate_limiter)
+    return {"labeled": labeled, "trashed": trashed}
+
+
+class LlmSlot:
+    """
+    Holds one slot of the shared Gemini semaphore for the duration of a with block.
+
+    A worker killed while holding a slot never gives it back, so after
+    ``timeout`` seconds the call goes ahead without a slot instead of
+    waiting forever.
+    """
+
+    def __init__(self, semaphore, timeout=LLM_SLOT_TIMEOUT):
+        self.semaphore = semaphore
+        self.timeout = timeout
+        self.held = []
+
+    def __enter__(self):
+        acquired = self.semaphore.acquire(timeout=self.timeout)
+        if not acquired:
+            print(f"[WARNING] No Gemini slot free after {self.timeout}s, going ahead without one")
+        self.held.append(acquired)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.held.pop():
+            self.semaphore.release()
+        return False
+
+
+def run_account(account, llm_semaphore=None):
+    """
+    Run the whole pipeline for one account. Meant to run in a worker process.
+
+    Output goes to <dir>/run.log. Errors are caught and reported in the
+    returned summary so one broken account does not stop the others.
+    """
+    os.makedirs(account["dir"], exist_ok=True)
+    summary = {"name": account["name"], "status": "ok", "error": None}
+    summary.update({column: 0 for column in SUMMARY_COLUMNS})
+    start_time = time.time()
+
+    log_path = os.path.join(account["dir"], "run.log")
+    with open(log_path, "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+        try:
+            service = gmail_service(
+                token_path=account["token"],
+                credentials_path=account["credentials"],
+                headless=True
+            )
+            service._baseUrl = "https://gmail.googleapis.com/"
+            create_db(account["db"])
+
+            rate_limiter = RateLimiter(account["gmail_rate"])
+            summary["stored"] = sync_emails(service, db_path=account["db"], rate_limiter=rate_limiter)
+            summary["classified"] = classify_all(
+                db_path=account["db"],
+                llm_semaphore=LlmSlot(llm_semaphore) if llm_semaphore is not None else None,
+                max_errors=MAX_CLASSIFY_ERRORS
+            )
+
+            if account["sort"]:
+                summary.update(sort_account(service, account, rate_limiter=rate_limiter))
+
+            unsubscribe_list = get_unsubscribe_links(account["db"])
+            export_to_csv(unsubscribe_list, filename=os.path.join(account["dir"], "unsubscribe_links.csv"))
+            summary["unsubscribe_links"] = len(unsubscribe_list)
+        except Exception as e:
+            summary["status"] = "error"
+            summary["error"] = f"{type(e).__name__}: {e}"
+            traceback.print_exc(file=log)
+
+        if os.path.exists(account["db"]):
+            try:
+                # The run may have failed before create_db brought an old database up to date
+                upgrade_db(account["db"])
+                stats = get_mailbox_stats(account["db"])
+                summary["important"] = stats["important"]
+                summary["not_important"] = stats["not_important"]
+            except sqlite3.Error as e:
+                print(f"[WARNING] Could not read mailbox stats: {e}")
+
+    summary["seconds"] = round(time.time() - start_time, 2)
+    return summary
+
+
+def account_worker(account, llm_semaphore, conn):
+    """Process target: run one account and send its summary back through ``conn``."""
+    conn.send(run_account(account, llm_semaphore))
+    conn.close()
+
+
+def run_all(manifest, workers=None, llm_concurrency=None):
+    """
+    Run every account in its own process, at most ``workers`` at a time, and
+    return their summaries in manifest order.
+
+    Each account gets a fresh process, so one that dies (killed, out of
+    memory, a crash in a C extension) is reported as an error for that
+    account alone while the others carry on.
+    """
+    accounts = manifest["accounts"]
+    # Workers mostly wait on Gmail and Gemini, so the CPU count is not a useful cap
+    workers = workers or manifest.get("workers") or min(len(accounts), DEFAULT_WORKERS)
+    llm_concurrency = llm_concurrency or manifest.get("llm_concurrency", DEFAULT_LLM_CONCURRENCY)
+    print(f"Running {len(accounts)} accounts with {workers} workers, "
+          f"{llm_concurrency} concurrent Gemini calls...")
+
+    results = {}
+    queued = list(accounts)
+    running = {}  # process sentinel -> (process, receiving end of its pipe, account name)
+    with multiprocessing.Manager() as manager:
+        llm_semaphore = manager.BoundedSemaphore(llm_concurrency)
+        while queued or running:
+            while queued and len(running) < workers:
+                account = queued.pop(0)
+                receiver, sender = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(
+                    target=account_worker,
+                    args=(account, llm_semaphore, sender),
+                    name=f"account-{account['name']}"
+                )
+                process.start()
+                sender.close()  # so recv() sees EOF if the worker dies without sending
+                running[process.sentinel] = (process, receiver, account["name"])
+
+            for sentinel in wait(list(running)):
+                process, receiver, name = running.pop(sentinel)
+                try:
+                    summary = receiver.recv()
+                except EOFError:
+                    summary = None
+                receiver.close()
+                process.join()
+
+                if summary is None:
+                    # The worker itself died, e.g. killed or out of memory
+                    summary = {"name": name, "status": "error",
+                               "error": f"Worker process exited with code {process.exitcode}"}
+                    summary.update({column: 0 for column in SUMMARY_COLUMNS})
+
+                if summary["status"] == "ok":
+                    print(f"[SUCCESS] {name}: done in {summary['seconds']}s")
+                else:
+                    print(f"[WARNING] {name}: {summary['error']}")
+                results[name] = summary
+
+    return [results[account["name"]] for account in accounts]
+
+
+def print_summary(results):
+    """Print a consolidated table of all accounts with a total row."""
+    header = f"{'account':<20} {'status':<7}" + "".join(f" {c:>17}" for c in SUMMARY_COLUMNS)
+    print("\n--- Summary ---")
+    print(header)
+    for r in results:
+        print(f"{r['name']:<20} {r['status']:<7}" + "".join(f" {r[c]:>17,}" for c in SUMMARY_COLUMNS))
+    totals = {c: sum(r[c] for r in results) for c in SUMMARY_COLUMNS}
+    ok = sum(r["status"] == "ok" for r in results)
+    print(f"{'TOTAL':<20} {f'{ok}/{len(results)}':<7}" + "".join(f" {totals[c]:>17,}" for c in SUMMARY_COLUMNS))
+    for r in results:
+        if r["error"]:
+            print(f"[WARNING] {r['name']}: {r['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run CleanMail headless for several Gmail accounts")
+    parser.add_argument("manifest", help="JSON account manifest")
+    parser.add_argument("--workers", type=int, help=f"Max accounts running at once (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--llm-concurrency", type=int, help="Max concurrent Gemini calls across all accounts")
+    parser.add_argument("--summary", help="Also write the summary to this JSON file")
+    parser.add_argument("--authorize", metavar="NAME", help="Log in to one account in the browser and save its token")
+    args = parser.parse_args(argv)
+
+    manifest = load_manifest(args.manifest)
+
+    if args.authorize:
+        account = next((a for a in manifest["accounts"] if a["name"] == args.authorize), None)
+        if not account:
+            print(f"[ERROR] No account named '{args.authorize}' in the manifest")
+            return 1
+        os.makedirs(account["dir"], exist_ok=True)
+        gmail_service(token_path=account["token"], credentials_path=account["credentials"])
+        print(f"[SUCCESS] Saved token for '{account['name']}' to '{account['token']}'")
+        return 0
+
+    results = run_all(manifest, workers=args.workers, llm_concurrency=args.llm_concurrency)
+    print_summary(results)
+
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSummary written to '{args.summary}'")
+
+    return 0 if all(r["status"] == "ok" for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,18 @@
 import sqlite3
 from googleapiclient.errors import HttpError
 
+from CreateDb import pause_sender_stats, resume_sender_stats
+
 # -------------------------------
 # 1. Ensure Review Label Exists
 # -------------------------------
-def get_or_create_label(service, label_name="Review_Not_Important", user_id="me"):
+def get_or_create_label(service, label_name="Review_Not_Important", user_id="me", rate_limiter=None):
     """
     Ensure a Gmail label exists. Create it if missing.
     """
     try:
+        if rate_limiter:
+            rate_limiter.acquire()
         results = service.users().labels().list(userId=user_id).execute()
         labels = results.get("labels", [])
 
@@ -23,6 +27,8 @@ def get_or_create_label(service, label_name="Review_Not_Important", user_id="me"
             "labelListVisibility": "labelShow",
             "messageListVisibility": "show"
         }
+        if rate_limiter:
+            rate_limiter.acquire()
         new_label = service.users().labels().create(userId=user_id, body=label_body).execute()
         print(f"Created new label: {label_name}")
         return new_label["id"]
@@ -50,7 +56,7 @@ def fetch_not_important_ids(db="emails.db"):
 # -------------------------------
 # 3. Apply Review Label in Gmail
 # -------------------------------
-def label_not_important(service, review_label_id, db="emails.db", user_id="me"):
+def label_not_important(service, review_label_id, db="emails.db", user_id="me", rate_limiter=None):
     """
     Add review label to all NOT IMPORTANT emails from DB.
     Returns the number of messages labeled.
@@ -65,6 +71,8 @@ def label_not_important(service, review_label_id, db="emails.db", user_id="me"):
         chunk_size = 1000
         for i in range(0, len(msg_ids), chunk_size):
             chunk = msg_ids[i:i+chunk_size]
+            if rate_limiter:
+                rate_limiter.acquire()
             service.users().messages().batchModify(
                 userId=user_id,
                 body={
@@ -85,7 +93,7 @@ def label_not_important(service, review_label_id, db="emails.db", user_id="me"):
 # -------------------------------
 # 4. Move Review Label mails to Trash
 # -------------------------------
-def move_to_trash(service, msg_ids, user_id="me"):
+def move_to_trash(service, msg_ids, user_id="me", rate_limiter=None):
     """
     Move a list of message IDs to Trash in chunks to avoid timeouts.
     """
@@ -98,6 +106,8 @@ def move_to_trash(service, msg_ids, user_id="me"):
 
     for i in range(0, len(msg_ids), chunk_size):
         chunk = msg_ids[i:i + chunk_size]
+        if rate_limiter:
+            rate_limiter.acquire()
         try:
             service.users().messages().batchModify(
                 userId=user_id,
@@ -117,9 +127,34 @@ def move_to_trash(service, msg_ids, user_id="me"):
     return total
 
 
+# Only `reviewed` changes, so sender_stats just needs the number of newly
+# reviewed emails per sender (the key always exists: every email is counted in)
+COUNT_NEWLY_REVIEWED_SQL = """
+    INSERT INTO sender_stats (sender_key, reviewed)
+    SELECT IFNULL(sender_key, ''), COUNT(*)
+    FROM emails
+    WHERE id IN (SELECT id FROM temp.reviewed_ids) AND reviewed IS NOT 1
+    GROUP BY IFNULL(sender_key, '')
+    ON CONFLICT (sender_key) DO UPDATE SET reviewed = reviewed + excluded.reviewed
+"""
+
+
 def mark_as_reviewed(ids, db="emails.db"):
+    """Set reviewed=1 for the given emails, updating sender_stats once per sender."""
     conn = sqlite3.connect(db)
     cursor = conn.cursor()
-    cursor.executemany("UPDATE emails SET reviewed=1 WHERE id=?", [(i,) for i in ids])
-    conn.commit()
-    conn.close()
+    try:
+        conn.execute("BEGIN TRANSACTION")
+        cursor.execute("CREATE TEMP TABLE reviewed_ids (id TEXT PRIMARY KEY)")
+        cursor.executemany("INSERT OR IGNORE INTO temp.reviewed_ids VALUES (?)", ((i,) for i in ids))
+
+        pause_sender_stats(cursor)
+        cursor.execute(COUNT_NEWLY_REVIEWED_SQL)
+        cursor.execute("UPDATE emails SET reviewed = 1 WHERE id IN (SELECT id FROM temp.reviewed_ids)")
+        resume_sender_stats(cursor)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,112 @@
+import sqlite3
+import csv
+import json
+import sys
+from datetime import datetime, timezone
+
+# Columns of sender_stats the top senders report can be ordered by (each has an index)
+# Columns get_top_senders can order by; interpolated into the SQL, so only these are allowed
+SORT_COLUMNS = ("total", "not_important")
+
+SENDER_FIELDS = [
+    "sender_key", "sender", "total", "important", "not_important", "not_important_pct",
+    "reviewed", "unsubscribe_url", "oldest", "newest",
+]
+
+def get_mailbox_stats(db_name="emails.db"):
+    """Counts emails in the database by category, review state and unsubscribe link."""
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    # Summed over sender_stats: one row per sender (about 20k at 1M mails) instead of one per email
+    cursor.execute("""
+        SELECT
+            SUM(total),
+            SUM(important),
+            SUM(not_important),
+            SUM(total - important - not_important),
+            SUM(reviewed),
+            SUM(with_unsubscribe_link),
+            COUNT(*)
+        FROM sender_stats
+    """)
+    row = cursor.fetchone()
+    conn.close()
+
+    keys = ["total", "important", "not_important", "unclassified", "reviewed", "with_unsubscribe_link", "senders"]
+    return {key: value or 0 for key, value in zip(keys, row)}
+
+def format_ts(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d") if ts is not None else None
+
+def get_top_senders(db_name="emails.db", limit=20, sort="total"):
+    """
+    Returns the top senders from sender_stats, ordered by total emails or by
+    NOT IMPORTANT emails. Reads only `limit` rows through an index.
+    """
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Can't sort senders by '{sort}', use one of {SORT_COLUMNS}")
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT sender_key, sender, total, important, not_important, reviewed,
+               unsubscribe_url, oldest_ts, newest_ts
+        FROM sender_stats
+        ORDER BY {sort} DESC
+        LIMIT ?
+    """, (limit,))
+    rows = cursor.fetchall()
+    conn.close()
+
+    senders = []
+    for sender_key, sender, total, important, not_important, reviewed, url, oldest_ts, newest_ts in rows:
+        senders.append({
+            "sender_key": sender_key,
+            "sender": sender,
+            "total": total,
+            "important": important,
+            "not_important": not_important,
+            "not_important_pct": round(100.0 * not_important / total, 1) if total else 0.0,
+            "reviewed": reviewed,
+            "unsubscribe_url": url,
+            "oldest": format_ts(oldest_ts),
+            "newest": format_ts(newest_ts),
+        })
+    return senders
+
+def print_stats(stats):
+    """Prints mailbox stats to the terminal."""
+    print("\n--- Mailbox Stats ---")
+    print(f"Total emails:          {stats['total']}")
+    print(f"Senders:               {stats['senders']}")
+    print(f"IMPORTANT:             {stats['important']}")
+    print(f"NOT IMPORTANT:         {stats['not_important']}")
+    print(f"Unclassified:          {stats['unclassified']}")
+    print(f"Reviewed:              {stats['reviewed']}")
+    print(f"With unsubscribe link: {stats['with_unsubscribe_link']}")
+    print("--- End of Stats ---")
+
+def print_top_senders(senders):
+    """Prints the top senders as a table in the terminal."""
+    print("\n--- Top Senders ---")
+    print(f"{'Sender':<40} {'Emails':>7} {'% NOT IMP':>9} {'Oldest':>10} {'Newest':>10}  Unsubscribe")
+    for s in senders:
+        print(f"{s['sender_key'][:40]:<40} {s['total']:>7} {s['not_important_pct']:>9.1f} "
+              f"{s['oldest'] or '-':>10} {s['newest'] or '-':>10}  {'yes' if s['unsubscribe_url'] else '-'}")
+    print("--- End of Top Senders ---")
+
+def export_top_senders(senders, fmt="csv", filename=None):
+    """Writes the top senders as CSV or JSON, to a file or to stdout."""
+    out = open(filename, "w", newline="", encoding="utf-8") if filename else sys.stdout
+    try:
+        if fmt == "json":
+            json.dump(senders, out, indent=2)
+            out.write("\n")
+        else:
+            writer = csv.DictWriter(out, fieldnames=SENDER_FIELDS)
+            writer.writeheader()
+            writer.writerows(senders)
+    finally:
+        if filename:
+            out.close()
+    if filename:
+        print(f"Exported {len(senders)} senders to '{filename}'.")
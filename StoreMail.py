@@ -1,17 +1,93 @@
+import re
 import time
 import random
 import sqlite3
+import threading
 
 from googleapiclient.errors import HttpError
-from googleapiclient.http import BatchHttpRequest
 
+from CreateDb import (
+    normalize_sender,
+    parse_date_ts,
+    pause_sender_stats,
+    resume_sender_stats,
+    count_sender_stats
+)
+
+# Headers requested from Gmail for every message
+METADATA_HEADERS = ["From", "Subject", "Date", "List-Unsubscribe"]
+UNSUBSCRIBE_URL_RE = re.compile(r'<(https?://[^>]+)>')
+
+# Upsert instead of INSERT OR REPLACE: REPLACE deletes the old row without
+# firing delete triggers, which would double count it in sender_stats.
+# Every column is still overwritten and reviewed reset, like REPLACE did.
+INSERT_EMAIL_SQL = """
+    INSERT INTO emails
+    (id, sender, subject, date, snippet, category, unsubscribe_url, sender_key, date_ts)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        sender = excluded.sender,
+        subject = excluded.subject,
+        date = excluded.date,
+        snippet = excluded.snippet,
+        category = excluded.category,
+        unsubscribe_url = excluded.unsubscribe_url,
+        sender_key = excluded.sender_key,
+        date_ts = excluded.date_ts,
+        reviewed = 0
+"""
+
+# Resolved on first use by batch_request_class(): googleapiclient.http is slow to import
+BatchHttpRequest = None
+
+
+def batch_request_class():
+    """Return googleapiclient's BatchHttpRequest, importing it on first use."""
+    global BatchHttpRequest
+    if BatchHttpRequest is None:
+        from googleapiclient.http import BatchHttpRequest
+    return BatchHttpRequest
+
+
+class RateLimiter:
+    """
+    Token bucket limiting Gmail calls per second for one account.
+
+    Gmail allows 250 quota units per user per second and messages.get costs 5,
+    so the default of 40 calls/s keeps some headroom below the 50/s limit.
+    """
 
-def fetch_all_message_ids(service, query=""):
+    def __init__(self, rate=40, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, n=1):
+        """Block until n calls may be made."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                # A request bigger than the bucket only has to wait for a full bucket
+                needed = min(n, self.capacity)
+                if self.tokens >= needed:
+                    self.tokens -= n
+                    return
+                wait = (needed - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def fetch_all_message_ids(service, query="", rate_limiter=None):
     """Fetch all message IDs in the account for batching."""
     all_ids = []
     page_token = None
 
     while True:
+        if rate_limiter:
+            rate_limiter.acquire()
         results = service.users().messages().list(
             userId="me",
             q=query,
@@ -29,7 +105,7 @@ def fetch_all_message_ids(service, query=""):
     return all_ids
 
 
-def fetch_all_messages(service, message_ids, batch_size=50, max_retries=5):
+def fetch_all_messages(service, message_ids, batch_size=50, max_retries=5, rate_limiter=None):
     """
     Fetch all messages in batches with retries until every message is fetched.
 
@@ -38,6 +114,7 @@ def fetch_all_messages(service, message_ids, batch_size=50, max_retries=5):
         message_ids: List of Gmail message IDs
         batch_size: Number of messages per batch
         max_retries: Max retry attempts per batch
+        rate_limiter: Optional RateLimiter for the account; each message in a batch counts as one call
 
     Returns:
         List of successfully fetched messages
@@ -69,16 +146,19 @@ def fetch_all_messages(service, message_ids, batch_size=50, max_retries=5):
                         batch_messages.append(response)
                         success_ids.append(request_id)
 
-                batch = BatchHttpRequest(callback=callback, batch_uri='https://gmail.googleapis.com/batch')
+                batch = batch_request_class()(callback=callback, batch_uri='https://gmail.googleapis.com/batch')
 
                 for msg_id in batch_ids:
                     batch.add(service.users().messages().get(
                         userId="me",
                         id=msg_id,
                         format="metadata",
-                        metadataHeaders=["From","Subject","Date","List-Unsubscribe"]
+                        metadataHeaders=METADATA_HEADERS
                     ), request_id=msg_id)
 
+                if rate_limiter:
+                    rate_limiter.acquire(len(batch_ids))
+
                 try:
                     batch.execute()
                     break  # batch succeeded
@@ -106,6 +186,14 @@ def fetch_all_messages(service, message_ids, batch_size=50, max_retries=5):
     return all_messages
 
 
+def message_ts(msg, date):
+    """Unix timestamp of a message: Gmail's internalDate, else its Date header."""
+    internal_date = msg.get("internalDate")
+    if internal_date:
+        return int(internal_date) // 1000
+    return parse_date_ts(date)
+
+
 def parse_email_metadata(msg):
     headers = {h['name']: h['value'] for h in msg['payload']['headers']}
 
@@ -117,18 +205,92 @@ def parse_email_metadata(msg):
         "unsubscribe_url": None,
         "snippet": msg.get("snippet"),  # add snippet for context
     }
+    email_data["date_ts"] = message_ts(msg, email_data["date"])
 
     # Extract List-Unsubscribe URL
     unsub_header = headers.get("List-Unsubscribe")
     if unsub_header:
-        import re
-        urls = re.findall(r'<(https?://[^>]+)>', unsub_header)
-        if urls:
-            email_data["unsubscribe_url"] = urls[0]
+        match = UNSUBSCRIBE_URL_RE.search(unsub_header)
+        if match:
+            email_data["unsubscribe_url"] = match.group(1)
 
     return email_data
 
 
+def parse_email_row(msg):
+    """
+    Lean version of parse_email_metadata for bulk ingest.
+
+    Only looks at the four wanted headers and returns a tuple in the column
+    order of INSERT_EMAIL_SQL, so no dicts are built per message.
+    The last two fields are the normalized sender and the date timestamp
+    used by sender_stats.
+    """
+    sender = subject = date = unsub_header = None
+    for header in msg['payload']['headers']:
+        name = header['name']
+        if name == "From":
+            sender = header['value']
+        elif name == "Subject":
+            subject = header['value']
+        elif name == "Date":
+            date = header['value']
+        elif name == "List-Unsubscribe":
+            unsub_header = header['value']
+
+    unsubscribe_url = None
+    if unsub_header:
+        match = UNSUBSCRIBE_URL_RE.search(unsub_header)
+        if match:
+            unsubscribe_url = match.group(1)
+
+    return (
+        msg['id'], sender, subject, date, msg.get("snippet"), None, unsubscribe_url,
+        normalize_sender(sender), message_ts(msg, date)
+    )
+
+
+def insert_email_rows(rows, db_name="emails.db"):
+    """
+    Insert email rows into the SQLite database using a single transaction.
+
+    rows: iterable of tuples from parse_email_row. A generator is consumed
+          lazily by executemany, so the rows never have to be in memory at once.
+
+    New emails are counted into sender_stats once per sender after the
+    insert instead of one trigger per row. Emails that already existed are
+    still updated by the triggers, one row at a time, so a re-sync is slower
+    than a first sync (a grouped subtract and re-count measured slower still).
+
+    Returns the number of emails stored: new ones plus existing ones that
+    were overwritten (sqlite3 counts both in rowcount).
+    """
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    stored = 0
+
+    try:
+        conn.execute("BEGIN TRANSACTION")  # start transaction
+        # SQLite gives every new row a rowid past the current largest one
+        cursor.execute("SELECT IFNULL(MAX(rowid), 0) + 1 FROM emails")
+        first_new_rowid = cursor.fetchone()[0]
+        pause_sender_stats(cursor, from_rowid=first_new_rowid)
+        cursor.executemany(INSERT_EMAIL_SQL, rows)
+        stored = max(cursor.rowcount, 0)
+        count_sender_stats(cursor, "SELECT * FROM emails WHERE rowid >= :first", first=first_new_rowid)
+        resume_sender_stats(cursor)
+        conn.commit()  # commit once
+        print(f"Stored {stored} emails (new or updated).")
+    except sqlite3.Error as e:
+        conn.rollback()  # rollback on error
+        stored = 0
+        print(f"Error inserting emails: {e}")
+    finally:
+        conn.close()
+
+    return stored
+
+
 def insert_emails_transaction(emails, db_name="emails.db"):
     """
     Insert a list of emails into the SQLite database using a single transaction.
@@ -140,7 +302,7 @@ def insert_emails_transaction(emails, db_name="emails.db"):
         return
 
     # Prepare data for bulk insert
-    data = [
+    data = (
         (
             e.get("id"),
             e.get("from"),
@@ -148,25 +310,10 @@ def insert_emails_transaction(emails, db_name="emails.db"):
             e.get("date"),
             e.get("snippet"),
             e.get("category"),
-            e.get("unsubscribe_url")
+            e.get("unsubscribe_url"),
+            normalize_sender(e.get("from")),
+            e.get("date_ts") or parse_date_ts(e.get("date"))
         )
         for e in emails
-    ]
-
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
-
-    try:
-        conn.execute("BEGIN TRANSACTION")  # start transaction
-        cursor.executemany("""
-            INSERT OR REPLACE INTO emails
-            (id, sender, subject, date, snippet, category, unsubscribe_url)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, data)
-        conn.commit()  # commit once
-        print(f"Inserted {len(emails)} emails successfully.")
-    except sqlite3.Error as e:
-        conn.rollback()  # rollback on error
-        print(f"Error inserting emails: {e}")
-    finally:
-        conn.close()
+    )
+    insert_email_rows(data, db_name=db_name)
@@ -10,9 +10,8 @@ def get_unsubscribe_links(db_name="emails.db"):
     conn.close()
     return rows
 
-def export_to_csv(unsubscribe_list):
+def export_to_csv(unsubscribe_list, filename="unsubscribe_links.csv"):
     """Exports the list of unsubscribe links to a CSV file."""
-    filename = "unsubscribe_links.csv"
     with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
         writer = csv.writer(csvfile)
         writer.writerow(['Sender', 'Subject', 'Unsubscribe Link'])
@@ -0,0 +1,128 @@
+"""
+Startup benchmark: how long it takes before each command can start working.
+
+Every measurement runs in a fresh interpreter, so nothing is cached in
+sys.modules. The "eager" row imports main plus the SDKs it used to load at
+import time, as a reference for the startup cost before they were lazy.
+
+Usage (from the project root):
+    python -m benchmarks.bench_import
+    python -m benchmarks.bench_import --repeat 10 --json startup.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = [
+    "google.generativeai",
+    "googleapiclient.discovery",
+    "googleapiclient.http",
+    "google_auth_oauthlib.flow",
+]
+
+IMPORT_SNIPPET = """
+import sys, time, json
+start = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+IMPORT_TARGETS = {
+    "import main": ["main"],
+    "import ClassifyMail": ["ClassifyMail"],
+    "import connectGmail": ["connectGmail"],
+    "import StoreMail": ["StoreMail"],
+    "import MultiAccount": ["MultiAccount"],
+    "eager (previous startup)": ["main"] + HEAVY_MODULES,
+}
+
+
+def time_import(modules):
+    """Import modules in a fresh interpreter and return (seconds, heavy modules loaded)."""
+    code = IMPORT_SNIPPET.format(
+        imports="\n".join(f"import {m}" for m in modules),
+        heavy=HEAVY_MODULES,
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    return result["seconds"], result["loaded"]
+
+
+def time_command(args):
+    """Run a main.py command in a fresh interpreter and return its wall time."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT, "main.py")] + args,
+        cwd=ROOT, capture_output=True, check=True,
+    )
+    return time.perf_counter() - start
+
+
+def make_sample_db(path):
+    from CreateDb import create_db
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_db(path)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO emails (id, sender, subject, category) VALUES (?, ?, ?, ?)",
+        [(str(i), f"sender{i % 10}@example.com", "Hello", "IMPORTANT") for i in range(100)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure CleanMail startup time")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per target; the median is reported")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, ROOT)
+    results = []
+
+    for name, modules in IMPORT_TARGETS.items():
+        runs = [time_import(modules) for _ in range(args.repeat)]
+        results.append({
+            "target": name,
+            "seconds": statistics.median(seconds for seconds, _ in runs),
+            "heavy_loaded": runs[-1][1],
+        })
+
+    with tempfile.TemporaryDirectory(prefix="cleanmail-startup-") as tmp:
+        db_path = os.path.join(tmp, "emails.db")
+        make_sample_db(db_path)
+        commands = {
+            "main.py --help": ["--help"],
+            "main.py stats": ["--db", db_path, "stats"],
+            "main.py unsubscribe --print": ["--db", db_path, "unsubscribe", "--print"],
+        }
+        for name, command in commands.items():
+            runs = [time_command(command) for _ in range(args.repeat)]
+            results.append({"target": name, "seconds": statistics.median(runs), "heavy_loaded": None})
+
+    print(f"{'target':<30} {'median s':>9}  heavy SDKs loaded")
+    for r in results:
+        loaded = "-" if r["heavy_loaded"] is None else (", ".join(r["heavy_loaded"]) or "none")
+        print(f"{r['target']:<30} {r['seconds']:>9.3f}  {loaded}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to '{args.json}'")
+
+
+if __name__ == "__main__":
+    main()
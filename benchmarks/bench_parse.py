@@ -0,0 +1,142 @@
+"""
+Ingest benchmark: parse_email_metadata + insert_emails_transaction (dict per
+email) against parse_email_row + insert_email_rows (tuple per email, streamed).
+
+For each path it reports:
+    parse/s           messages parsed per second into a list
+    held blocks/msg   memory blocks still held per parsed message once parsing
+                      is done (sys.getallocatedblocks). This is retained
+                      memory, not the number of allocations: temporaries freed
+                      while parsing don't count, they show up in the parse peak.
+    parse peak B/msg  tracemalloc peak while parsing into a list, per message
+    ingest/s          messages parsed and inserted into SQLite per second
+    ingest peak MB    tracemalloc peak while parsing and inserting
+
+Usage (from the project root):
+    python -m benchmarks.bench_parse --size 100k
+"""
+import argparse
+import contextlib
+import gc
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from CreateDb import create_db
+from StoreMail import (
+    METADATA_HEADERS,
+    normalize_sender,
+    parse_email_metadata,
+    parse_email_row,
+    insert_emails_transaction,
+    insert_email_rows
+)
+
+from benchmarks.corpus import SyntheticCorpus, parse_size
+
+
+def make_messages(size, seed=0):
+    """Messages as returned by messages.get(format="metadata") with the headers StoreMail asks for."""
+    corpus = SyntheticCorpus(size, seed=seed)
+    messages = []
+    for i in range(size):
+        msg = corpus.message(i)
+        msg["payload"]["headers"] = [h for h in msg["payload"]["headers"] if h["name"] in METADATA_HEADERS]
+        messages.append(msg)
+    return messages
+
+
+def ingest_dicts(messages, db_name):
+    insert_emails_transaction([parse_email_metadata(msg) for msg in messages], db_name=db_name)
+
+
+def ingest_rows(messages, db_name):
+    insert_email_rows((parse_email_row(msg) for msg in messages), db_name=db_name)
+
+
+PATHS = {
+    "dict": (parse_email_metadata, ingest_dicts),
+    "tuple": (parse_email_row, ingest_rows),
+}
+
+
+def best_of(repeat, func, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def parse_memory(parse, messages):
+    """Blocks held per message after parsing, and the traced peak bytes per message while parsing."""
+    gc.collect()
+    before = sys.getallocatedblocks()
+    parsed = [parse(msg) for msg in messages]
+    held = sys.getallocatedblocks() - before
+    del parsed
+
+    gc.collect()
+    tracemalloc.start()
+    parsed = [parse(msg) for msg in messages]
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del parsed
+    return held / len(messages), peak / len(messages)
+
+
+def run_ingest(ingest, messages, workdir, name, trace=False):
+    db_name = os.path.join(workdir, f"{name}.db")
+    if os.path.exists(db_name):
+        os.remove(db_name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_db(db_name)
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        ingest(messages, db_name)
+        elapsed = time.perf_counter() - start
+        peak = 0
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the dict and tuple ingest paths")
+    parser.add_argument("--size", type=parse_size, default=100_000, help="Number of messages (default: 100k)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the best is reported")
+    args = parser.parse_args(argv)
+
+    messages = make_messages(args.size)
+
+    # Both paths must store exactly the same rows
+    for msg in messages:
+        d = parse_email_metadata(msg)
+        expected = (
+            d["id"], d["from"], d["subject"], d["date"], d["snippet"], None, d["unsubscribe_url"],
+            normalize_sender(d["from"]), d["date_ts"]
+        )
+        if parse_email_row(msg) != expected:
+            raise AssertionError(f"parse_email_row differs from parse_email_metadata for {msg['id']}")
+
+    print(f"{args.size:,} messages")
+    print(f"{'path':<6} {'parse/s':>12} {'held blocks/msg':>16} {'parse peak B/msg':>17} "
+          f"{'ingest/s':>12} {'ingest peak MB':>15}")
+    with tempfile.TemporaryDirectory(prefix="cleanmail-parse-") as workdir:
+        for name, (parse, ingest) in PATHS.items():
+            parse_time = best_of(args.repeat, lambda: [parse(msg) for msg in messages])
+            held, parse_peak = parse_memory(parse, messages)
+            ingest_time = min(run_ingest(ingest, messages, workdir, name)[0] for _ in range(args.repeat))
+            _, peak = run_ingest(ingest, messages, workdir, name, trace=True)
+            print(f"{name:<6} {args.size / parse_time:>12,.0f} {held:>16.1f} {parse_peak:>17,.0f} "
+                  f"{args.size / ingest_time:>12,.0f} {peak:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Offline end-to-end benchmark of the main() pipeline.
+
+Runs every stage of main.py (list, fetch, ingest, classify, sort,
+unsubscribe) against an in-memory Gmail service and a fake Gemini model,
+and reports per-stage throughput and memory.
+
+Usage (from the project root):
+    python -m benchmarks.bench_pipeline --size 10k
+    python -m benchmarks.bench_pipeline --size 10k 100k 1m --json bench.json
+    python -m benchmarks.bench_pipeline --size 100k --compare bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from unittest import mock
+
+import ClassifyMail
+import StoreMail
+import main as cleanmail
+from CreateDb import create_db, rebuild_sender_stats
+from SortMail import fetch_not_important_ids
+from Unsubscribe import get_unsubscribe_links, export_to_csv
+
+from benchmarks.corpus import SyntheticCorpus, parse_size
+from benchmarks.fake_gemini import FakeGenerativeModel
+from benchmarks.fake_gmail import FakeGmailService, FakeBatchHttpRequest
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CLASSIFY_MAX_ERRORS = 5  # failed chunks in a row before the classify stage gives up
+
+
+def max_rss_mb():
+    """Peak resident memory of this process in MB, or None where the OS doesn't report it."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+class StageTimer:
+    """Collects wall time, item throughput and memory for each pipeline stage."""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        result = {"stage": name, "items": 0}
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield result
+        finally:
+            result["seconds"] = time.perf_counter() - start
+            if self.trace_memory:
+                result["traced_peak_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                tracemalloc.stop()
+            result["max_rss_mb"] = max_rss_mb()
+            result["items_per_sec"] = result["items"] / result["seconds"] if result["seconds"] else 0.0
+            self.stages.append(result)
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(previous)
+
+
+def timed(timer, name, func):
+    """Wrap ``func`` so each call is recorded as stage ``name``, counting items from its result."""
+    def wrapper(*args, **kwargs):
+        with timer.stage(name) as s:
+            result = func(*args, **kwargs)
+            s["items"] = result if isinstance(result, int) else len(result)
+        return result
+    return wrapper
+
+
+def run_pipeline(service, workdir, timer):
+    """
+    Run main.py's own steps, minus authentication: the prompts are answered
+    with "y". Stages are timed by wrapping the functions main calls, so
+    parsing, which is streamed into the insert, is part of "ingest".
+    """
+    db_path = os.path.join(workdir, "emails.db")
+    create_db(db_path)
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(mock.patch.object(cleanmail, "fetch_all_message_ids", timed(timer, "list_ids", cleanmail.fetch_all_message_ids)))
+        stack.enter_context(mock.patch.object(cleanmail, "fetch_all_messages", timed(timer, "fetch", cleanmail.fetch_all_messages)))
+        stack.enter_context(mock.patch.object(cleanmail, "insert_email_rows", timed(timer, "ingest", cleanmail.insert_email_rows)))
+        stack.enter_context(mock.patch("builtins.input", lambda prompt="": "y"))
+
+        cleanmail.sync_emails(service, db_path=db_path)
+
+        with timer.stage("classify") as s:
+            # Bounded so a model that always fails (e.g. --recitation-rate 1.0) can't hang the run
+            s["items"] = cleanmail.classify_all(
+                db_path=db_path,
+                llm_semaphore=threading.BoundedSemaphore(1),
+                max_errors=CLASSIFY_MAX_ERRORS
+            )
+
+        with timer.stage("sort") as s:
+            s["items"] = len(fetch_not_important_ids(db=db_path))
+            cleanmail.sort_emails(service, db_path=db_path)
+
+        with timer.stage("unsubscribe") as s:
+            unsubscribe_list = get_unsubscribe_links(db_path)
+            export_to_csv(unsubscribe_list)
+            s["items"] = len(unsubscribe_list)
+
+
+def sender_stats_mismatches(db_path):
+    """Return the number of senders whose incrementally kept stats differ from a full rebuild."""
+    query = "SELECT * FROM sender_stats"
+    conn = sqlite3.connect(db_path)
+    incremental = set(conn.execute(query))
+    conn.close()
+
+    rebuild_sender_stats(db_path)
+    conn = sqlite3.connect(db_path)
+    rebuilt = set(conn.execute(query))
+    conn.close()
+    return len({row[0] for row in incremental ^ rebuilt})
+
+
+def run_benchmark(size, args):
+    corpus = SyntheticCorpus(size, seed=args.seed)
+    service = FakeGmailService(
+        corpus,
+        latency=args.gmail_latency,
+        error_rate=args.error_rate,
+        batch_error_rate=args.batch_error_rate,
+        seed=args.seed,
+    )
+    model = FakeGenerativeModel(
+        latency=args.llm_latency,
+        recitation_rate=args.recitation_rate,
+        seed=args.seed,
+    )
+    timer = StageTimer(trace_memory=args.trace_memory)
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(mock.patch.object(StoreMail, "BatchHttpRequest", FakeBatchHttpRequest.for_service(service)))
+        stack.enter_context(mock.patch.object(ClassifyMail, "model", model))
+        if not args.real_sleeps:
+            # Backoff and pacing sleeps inside the pipeline; the fakes keep their own latency
+            stack.enter_context(mock.patch("time.sleep", lambda seconds: None))
+        workdir = stack.enter_context(tempfile.TemporaryDirectory(prefix="cleanmail-bench-"))
+        stack.enter_context(working_directory(workdir))
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+
+        start = time.perf_counter()
+        run_pipeline(service, workdir, timer)
+        total = time.perf_counter() - start
+        mismatches = sender_stats_mismatches(os.path.join(workdir, "emails.db"))
+
+    return {
+        "size": size,
+        "total_seconds": total,
+        "mails_per_sec": size / total if total else 0.0,
+        "max_rss_mb": max_rss_mb(),
+        "stages": timer.stages,
+        "gmail_calls": dict(service.calls),
+        "gmail_round_trips": service.round_trips,
+        "gmail_rate_limited": dict(service.rate_limited),
+        "llm_calls": dict(model.calls),
+        "sender_stats_mismatches": mismatches,
+    }
+
+
+def format_mb(value):
+    return "-" if value is None else f"{value:.0f}"
+
+
+def print_report(result):
+    print(f"\n=== {result['size']:,} mails: {result['total_seconds']:.2f}s end-to-end, "
+          f"{result['mails_per_sec']:,.0f} mails/s, max RSS {format_mb(result['max_rss_mb'])} MB ===")
+    header = f"{'stage':<12} {'items':>10} {'seconds':>9} {'items/s':>12} {'max RSS MB':>11}"
+    traced = any("traced_peak_mb" in s for s in result["stages"])
+    if traced:
+        header += f" {'traced peak MB':>15}"
+    print(header)
+    for s in result["stages"]:
+        line = (f"{s['stage']:<12} {s['items']:>10,} {s['seconds']:>9.3f} "
+                f"{s['items_per_sec']:>12,.0f} {format_mb(s['max_rss_mb']):>11}")
+        if traced:
+            line += f" {s['traced_peak_mb']:>15.1f}"
+        print(line)
+    print(f"Gmail calls: {result['gmail_calls']} in {result['gmail_round_trips']} round trips, "
+          f"429s: {result['gmail_rate_limited']}")
+    print(f"LLM calls: {result['llm_calls']}")
+    if result["sender_stats_mismatches"]:
+        print(f"[ERROR] sender_stats differs from a rebuild for {result['sender_stats_mismatches']:,} senders")
+    else:
+        print("sender_stats matches a full rebuild")
+
+
+def compare(results, baseline_path, tolerance):
+    """Return the list of stages whose throughput dropped more than ``tolerance`` vs the baseline."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["size"]: r for r in json.load(f)}
+
+    regressions = []
+    for result in results:
+        base = baseline.get(result["size"])
+        if not base:
+            print(f"[WARNING] No baseline for {result['size']:,} mails")
+            continue
+        base_stages = {s["stage"]: s for s in base["stages"]}
+        for s in result["stages"]:
+            b = base_stages.get(s["stage"])
+            if not b or not b["items_per_sec"]:
+                continue
+            change = s["items_per_sec"] / b["items_per_sec"] - 1
+            marker = "REGRESSION" if change < -tolerance else ""
+            print(f"{result['size']:>9,} {s['stage']:<12} {change:+7.1%} {marker}")
+            if marker:
+                regressions.append((result["size"], s["stage"], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the CleanMail pipeline")
+    parser.add_argument("--size", nargs="+", type=parse_size, default=[10_000],
+                        help="Corpus sizes, e.g. 10k 100k 1m (default: 10k)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--gmail-latency", type=float, default=0.0,
+                        help="Seconds per Gmail HTTP round trip")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Probability of a 429 for a single call inside a batch")
+    parser.add_argument("--batch-error-rate", type=float, default=0.0,
+                        help="Probability of a 429 for a whole batch request")
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="Seconds per generate_content call")
+    parser.add_argument("--recitation-rate", type=float, default=0.0,
+                        help="Probability of a RECITATION finish reason")
+    parser.add_argument("--real-sleeps", action="store_true",
+                        help="Keep the pipeline's own backoff/pacing sleeps")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Record tracemalloc peaks per stage (slow)")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed throughput drop vs baseline (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.size:
+        result = run_benchmark(size, args)
+        print_report(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to '{args.json}'")
+
+    status = 0
+    if any(r["sender_stats_mismatches"] for r in results):
+        status = 1
+
+    if args.compare:
+        print(f"\n--- Throughput vs {args.compare} ---")
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"[ERROR] {len(regressions)} stage(s) regressed more than {args.tolerance:.0%}")
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
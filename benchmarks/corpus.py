@@ -0,0 +1,99 @@
+import random
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+# Rough shape of a real mailbox: a few very noisy senders, a long tail of people
+NEWSLETTER_SHARE = 0.6
+SENDER_POOL_DIVISOR = 50
+RENAMED_SHARE = 0.1
+BASE_DATE = datetime(2025, 9, 1, 12, 0, tzinfo=timezone.utc)
+
+WORDS = [
+    "weekly", "digest", "invoice", "meeting", "sale", "update", "security",
+    "alert", "offer", "project", "deadline", "report", "welcome", "reminder",
+    "order", "shipped", "account", "review", "newsletter", "discount",
+]
+
+
+def parse_size(value):
+    """Parse corpus sizes like 10000, 10k or 1m."""
+    value = value.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    return int(float(value) * multiplier)
+
+
+class SyntheticCorpus:
+    """
+    Deterministic, lazily generated mailbox in Gmail API message format.
+
+    Messages are built on demand from their index, so a 1M mail corpus
+    only costs the ID list until the pipeline itself holds on to them.
+    """
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.seed = seed
+        self.ids = [f"{i:016x}" for i in range(size)]
+        self._index = {msg_id: i for i, msg_id in enumerate(self.ids)}
+
+        rng = random.Random(seed)
+        pool_size = max(10, size // SENDER_POOL_DIVISOR)
+        self.senders = []
+        for n in range(pool_size):
+            is_newsletter = rng.random() < NEWSLETTER_SHARE
+            domain = f"{rng.choice(WORDS)}{n}.example.com"
+            if is_newsletter:
+                self.senders.append((f"News {n} <news@{domain}>", True))
+            else:
+                self.senders.append((f"Person {n} <person{n}@{domain}>", False))
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, msg_id):
+        return msg_id in self._index
+
+    def message(self, i):
+        """Build the metadata-format message for index ``i``."""
+        rng = random.Random(self.seed * 1_000_003 + i)
+        # Skew towards the first senders so a few dominate the volume
+        sender, is_newsletter = self.senders[
+            int(len(self.senders) * rng.random() ** 3)
+        ]
+        subject = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 8))).capitalize()
+        if is_newsletter and rng.random() < RENAMED_SHARE:
+            # Same address, another display name, as when a list renames itself
+            sender = sender.replace("News ", "Daily News ", 1)
+        sent = BASE_DATE - timedelta(minutes=17 * i)
+        date = format_datetime(sent)
+
+        headers = [
+            {"name": "Delivered-To", "value": "me@example.com"},
+            {"name": "From", "value": sender},
+            {"name": "Subject", "value": subject},
+            {"name": "Date", "value": date},
+        ]
+        if is_newsletter:
+            domain = sender.split("@", 1)[1].rstrip(">")
+            headers.append({
+                "name": "List-Unsubscribe",
+                "value": f"<mailto:leave@{domain}>, <https://{domain}/unsubscribe?u={i}>",
+            })
+
+        return {
+            "id": self.ids[i],
+            "threadId": self.ids[i],
+            "labelIds": ["INBOX"],
+            "internalDate": str(int(sent.timestamp()) * 1000),
+            "snippet": f"{subject} - call 555-123-{i % 10000:04d} or visit https://{i}.example.org",
+            "payload": {"headers": headers},
+        }
+
+    def get(self, msg_id):
+        """Return the message for a Gmail ID, or None if it is not in the corpus."""
+        i = self._index.get(msg_id)
+        if i is None:
+            return None
+        return self.message(i)
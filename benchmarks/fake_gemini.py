@@ -0,0 +1,76 @@
+import random
+import re
+import threading
+from collections import Counter
+from time import sleep as _real_sleep
+
+FINISH_REASON_STOP = 1
+FINISH_REASON_RECITATION = 4
+
+# Lines produced by ClassifyMail.classify_emails: "3. From: ... | Subject: ... | Content: ..."
+PROMPT_LINE_RE = re.compile(r"^(\d+)\. From: (.*?) \| Subject: (.*?) \| Content:", re.MULTILINE)
+LOW_PRIORITY_HINTS = ("news", "newsletter", "digest", "sale", "offer", "discount", "welcome")
+
+
+class _Part:
+    def __init__(self, text):
+        self.text = text
+
+
+class _Content:
+    def __init__(self, parts):
+        self.parts = parts
+
+
+class _Candidate:
+    def __init__(self, finish_reason, text):
+        self.finish_reason = finish_reason
+        self.content = _Content([_Part(text)] if text else [])
+
+
+class _Response:
+    def __init__(self, candidates):
+        self.candidates = candidates
+
+
+class FakeGenerativeModel:
+    """
+    Stand-in for ``genai.GenerativeModel`` used as ``ClassifyMail.model``.
+
+    Answers every numbered email in the prompt with ``n,HIGH`` or ``n,LOW``
+    based only on the prompt line, so the same mail always gets the same label.
+
+    Args:
+        latency: seconds slept per generate_content call
+        recitation_rate: probability that a call finishes with RECITATION
+        seed: seed for the RECITATION injection
+    """
+
+    def __init__(self, latency=0.0, recitation_rate=0.0, seed=0):
+        self.latency = latency
+        self.recitation_rate = recitation_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = Counter()
+
+    @staticmethod
+    def label_for(sender, subject):
+        text = f"{sender} {subject}".lower()
+        return "LOW" if any(hint in text for hint in LOW_PRIORITY_HINTS) else "HIGH"
+
+    def generate_content(self, prompt, generation_config=None, safety_settings=None, **kwargs):
+        if self.latency:
+            _real_sleep(self.latency)
+
+        with self._lock:
+            recited = self.recitation_rate and self._rng.random() < self.recitation_rate
+            self.calls["recitation" if recited else "stop"] += 1
+
+        if recited:
+            return _Response([_Candidate(FINISH_REASON_RECITATION, None)])
+
+        lines = [
+            f"{num},{self.label_for(sender, subject)}"
+            for num, sender, subject in PROMPT_LINE_RE.findall(prompt)
+        ]
+        return _Response([_Candidate(FINISH_REASON_STOP, "\n".join(lines))])
@@ -0,0 +1,215 @@
+import json
+import random
+import threading
+from collections import Counter
+from time import sleep as _real_sleep
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+MAX_LIST_PAGE = 500
+MAX_BATCH_MODIFY_IDS = 1000
+
+
+def make_http_error(status, reason="", uri=None):
+    """Build a googleapiclient HttpError the same way the real client does."""
+    resp = httplib2.Response({"status": status})
+    resp.reason = reason
+    content = json.dumps({"error": {"code": status, "message": reason}}).encode()
+    return HttpError(resp, content, uri=uri)
+
+
+class _Request:
+    """Stand-in for googleapiclient.http.HttpRequest: a deferred call with execute()."""
+
+    def __init__(self, service, method, func, **kwargs):
+        self.service = service
+        self.method = method
+        self._func = func
+        self.kwargs = kwargs
+
+    def execute(self, http=None, num_retries=0):
+        self.service._round_trip(self.method)
+        self.service._maybe_rate_limit(self.method, 0.0)
+        return self._func(**self.kwargs)
+
+    def _run_in_batch(self):
+        self.service._maybe_rate_limit(self.method, self.service.error_rate)
+        return self._func(**self.kwargs)
+
+
+class _Messages:
+    def __init__(self, service):
+        self._service = service
+
+    def list(self, userId="me", q="", pageToken=None, maxResults=100, **kwargs):
+        return _Request(self._service, "messages.list", self._service._list_messages,
+                        q=q, pageToken=pageToken, maxResults=maxResults)
+
+    def get(self, userId="me", id=None, format="full", metadataHeaders=None, **kwargs):
+        return _Request(self._service, "messages.get", self._service._get_message,
+                        id=id, format=format, metadataHeaders=metadataHeaders)
+
+    def batchModify(self, userId="me", body=None, **kwargs):
+        return _Request(self._service, "messages.batchModify", self._service._batch_modify,
+                        body=body or {})
+
+
+class _Labels:
+    def __init__(self, service):
+        self._service = service
+
+    def list(self, userId="me", **kwargs):
+        return _Request(self._service, "labels.list", self._service._list_labels)
+
+    def create(self, userId="me", body=None, **kwargs):
+        return _Request(self._service, "labels.create", self._service._create_label,
+                        body=body or {})
+
+
+class _Users:
+    def __init__(self, service):
+        self._service = service
+
+    def messages(self):
+        return _Messages(self._service)
+
+    def labels(self):
+        return _Labels(self._service)
+
+
+class FakeGmailService:
+    """
+    In-memory stand-in for the object returned by
+    ``build("gmail", "v1", credentials=creds)``.
+
+    Args:
+        corpus: SyntheticCorpus backing the mailbox
+        latency: seconds slept per HTTP round trip (a batch is one round trip)
+        error_rate: probability that a single call inside a batch answers with a 429
+        batch_error_rate: probability that a whole batch request answers with a 429
+        seed: seed for the error injection
+    """
+
+    def __init__(self, corpus, latency=0.0, error_rate=0.0, batch_error_rate=0.0, seed=0):
+        self.corpus = corpus
+        self.latency = latency
+        self.error_rate = error_rate
+        self.batch_error_rate = batch_error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._baseUrl = "https://gmail.googleapis.com/"
+
+        self.labels = {
+            "INBOX": {"id": "INBOX", "name": "INBOX", "type": "system"},
+            "TRASH": {"id": "TRASH", "name": "TRASH", "type": "system"},
+        }
+        self.labeled = Counter()   # label id -> number of messages it was added to
+        self.calls = Counter()     # method -> number of calls served
+        self.rate_limited = Counter()
+        self.round_trips = 0
+
+    def users(self):
+        return _Users(self)
+
+    # -------------------------------
+    # Transport simulation
+    # -------------------------------
+    def _round_trip(self, method):
+        with self._lock:
+            self.round_trips += 1
+        if self.latency:
+            _real_sleep(self.latency)
+
+    def _maybe_rate_limit(self, method, rate):
+        with self._lock:
+            self.calls[method] += 1
+            hit = rate and self._rng.random() < rate
+            if hit:
+                self.rate_limited[method] += 1
+        if hit:
+            raise make_http_error(429, "Too many concurrent requests for user.")
+
+    # -------------------------------
+    # API methods
+    # -------------------------------
+    def _list_messages(self, q="", pageToken=None, maxResults=100):
+        start = int(pageToken or 0)
+        end = min(start + min(maxResults or 100, MAX_LIST_PAGE), len(self.corpus))
+        result = {
+            "messages": [{"id": msg_id, "threadId": msg_id} for msg_id in self.corpus.ids[start:end]],
+            "resultSizeEstimate": end - start,
+        }
+        if end < len(self.corpus):
+            result["nextPageToken"] = str(end)
+        return result
+
+    def _get_message(self, id=None, format="full", metadataHeaders=None):
+        msg = self.corpus.get(id)
+        if msg is None:
+            raise make_http_error(404, "Requested entity was not found.")
+        if format == "metadata" and metadataHeaders:
+            wanted = {h.lower() for h in metadataHeaders}
+            msg["payload"]["headers"] = [
+                h for h in msg["payload"]["headers"] if h["name"].lower() in wanted
+            ]
+        return msg
+
+    def _batch_modify(self, body):
+        ids = body.get("ids", [])
+        if len(ids) > MAX_BATCH_MODIFY_IDS:
+            raise make_http_error(400, f"Too many ids: {len(ids)} > {MAX_BATCH_MODIFY_IDS}")
+        for label_id in body.get("addLabelIds", []):
+            if label_id not in self.labels:
+                raise make_http_error(400, f"Invalid label: {label_id}")
+            self.labeled[label_id] += len(ids)
+        return ""
+
+    def _list_labels(self):
+        return {"labels": list(self.labels.values())}
+
+    def _create_label(self, body):
+        label_id = f"Label_{len(self.labels)}"
+        label = dict(body, id=label_id, type="user")
+        self.labels[label_id] = label
+        return label
+
+
+class FakeBatchHttpRequest:
+    """
+    Stand-in for googleapiclient.http.BatchHttpRequest bound to a FakeGmailService.
+
+    Use ``FakeBatchHttpRequest.for_service(service)`` to get a class with the
+    same constructor signature as the real one.
+    """
+
+    service = None
+
+    @classmethod
+    def for_service(cls, service):
+        return type("FakeBatchHttpRequest", (cls,), {"service": service})
+
+    def __init__(self, callback=None, batch_uri=None):
+        self._callback = callback
+        self.batch_uri = batch_uri
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        if request_id is None:
+            request_id = str(len(self._requests) + 1)
+        self._requests.append((request_id, request, callback))
+
+    def execute(self, http=None):
+        service = self.service
+        service._round_trip("batch")
+        service._maybe_rate_limit("batch", service.batch_error_rate)
+
+        for request_id, request, callback in self._requests:
+            response, exception = None, None
+            try:
+                response = request._run_in_batch()
+            except HttpError as e:
+                exception = e
+            callback = callback or self._callback
+            if callback is not None:
+                callback(request_id, response, exception)
@@ -1,8 +1,3 @@
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 import os
 
 # Change the scope depending on what you need
@@ -11,21 +6,38 @@ import os
 SCOPES = ["https://mail.google.com/"]
 
 
-def gmail_service():
-    """Authenticate and return Gmail API service."""
+def gmail_service(token_path="token.json", credentials_path="credentials.json", headless=False):
+    """
+    Authenticate and return Gmail API service.
+
+    With headless=True the browser login flow is never started: the token at
+    token_path must already be valid or refreshable, otherwise RuntimeError is raised.
+    """
+    # Imported here so commands that never talk to Gmail don't pay for them
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+
     creds = None
-    if os.path.exists("token.json"):
-        creds = Credentials.from_authorized_user_file("token.json", SCOPES)
+    if os.path.exists(token_path):
+        creds = Credentials.from_authorized_user_file(token_path, SCOPES)
 
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
             creds.refresh(Request())
+        elif headless:
+            raise RuntimeError(
+                f"No valid token at '{token_path}'. Authorize this account once interactively first."
+            )
         else:
             flow = InstalledAppFlow.from_client_secrets_file(
-                "credentials.json", SCOPES
+                credentials_path, SCOPES
             )
             creds = flow.run_local_server(port=0)
-        with open("token.json", "w") as token:
+        with open(token_path, "w") as token:
             token.write(creds.to_json())
 
-    return build("gmail", "v1", credentials=creds)
+    # Use the discovery document shipped with google-api-python-client
+    # instead of downloading it on every run
+    return build("gmail", "v1", credentials=creds, static_discovery=True, cache_discovery=False)
@@ -1,7 +1,10 @@
+import argparse
+import contextlib
 import os
+import sys
 import time
 from connectGmail import gmail_service
-from CreateDb import create_db
+from CreateDb import create_db, upgrade_db, rebuild_sender_stats
 import ClassifyMail
 from SortMail import (
     get_or_create_label,
@@ -10,8 +13,9 @@ from SortMail import (
     label_not_important,
     mark_as_reviewed
 )
-from StoreMail import fetch_all_message_ids, fetch_all_messages, parse_email_metadata, insert_emails_transaction
-from Unsubscribe import handle_unsubscribing
+from StoreMail import fetch_all_message_ids, fetch_all_messages, parse_email_row, insert_email_rows
+from Stats import SORT_COLUMNS, get_mailbox_stats, get_top_senders, print_stats, print_top_senders, export_top_senders
+from Unsubscribe import handle_unsubscribing, get_unsubscribe_links, export_to_csv, print_to_terminal
 
 # -----------------------
 # CONFIG
@@ -20,97 +24,88 @@ DB_PATH = "emails.db"
 CHUNK_SIZE = 100  # For classification and labeling
 
 # -----------------------
-# MAIN SCRIPT
+# PIPELINE STEPS
 # -----------------------
-def main():
-    # 1. Authenticate Gmail
-    service = gmail_service()
-    service._baseUrl = "https://gmail.googleapis.com/"
-
-    # 2. Initialize DB
-    if os.path.exists(DB_PATH):
-        while True:
-            choice = input(
-                f"Database '{DB_PATH}' already exists. What would you like to do?\n"
-                "1. Start Fresh (Deletes all existing data)\n"
-                "2. Continue with existing data\n"
-                "3. Exit\n"
-                "Enter your choice (1/2/3): "
-            ).strip()
-            if choice == '1':
-                print("Starting fresh, deleting old database...")
-                os.remove(DB_PATH)
-                create_db(DB_PATH)
-                break
-            elif choice == '2':
-                print(f"Continuing with existing database '{DB_PATH}'")
-                break
-            elif choice == '3':
-                print("Exiting.")
-                return
-            else:
-                print("Invalid choice. Please enter 1, 2, or 3.")
-    else:
-        print(f"Database not found at '{DB_PATH}', creating...")
-        create_db(DB_PATH)
-
+def sync_emails(service, db_path=DB_PATH, rate_limiter=None):
+    """
+    Fetch metadata for every message in Gmail and store it in the DB.
+    Returns the number of emails stored, new or updated.
+    """
     # 3. Fetch all message IDs from Gmail
     print("Fetching all message IDs from Gmail...")
-    message_ids = fetch_all_message_ids(service)
+    message_ids = fetch_all_message_ids(service, rate_limiter=rate_limiter)
     print(f"Total messages fetched: {len(message_ids)}")
 
     # 4. Fetch messages in batches
     print("Fetching full message data in batches...")
     start_time = time.time()
-    all_messages = fetch_all_messages(service, message_ids, batch_size=CHUNK_SIZE)
+    all_messages = fetch_all_messages(service, message_ids, batch_size=CHUNK_SIZE, rate_limiter=rate_limiter)
     end_time = time.time()
     print(f"Fetched {len(all_messages)} messages in {end_time - start_time:.2f}s")
 
-    # 5. Parse emails
-    print("Parsing emails...")
-    parsed_emails = [parse_email_metadata(msg) for msg in all_messages]
-
-    # 6. Store emails in DB using a transaction
-    print(f"Inserting {len(parsed_emails)} emails into DB...")
-    insert_emails_transaction(parsed_emails, db_name=DB_PATH)
+    # 5-6. Parse emails and stream them into the DB in one transaction
+    print(f"Parsing and inserting {len(all_messages)} emails into DB...")
+    stored = insert_email_rows((parse_email_row(msg) for msg in all_messages), db_name=db_path)
     print("[SUCCESS] Emails stored in DB")
+    return stored
 
-    # 7. Classify unclassified emails in chunks
+
+def classify_all(db_path=DB_PATH, llm_semaphore=None, max_errors=None):
+    """
+    Classify all unclassified emails in chunks.
+
+    llm_semaphore: optional semaphore held around every Gemini call, to share
+                   one LLM concurrency budget between several runs
+    max_errors: give up after this many failed chunks in a row (default: retry forever)
+
+    Returns the number of emails classified.
+    """
     print("Classifying emails with Gemini...")
     total_classified = 0
+    errors = 0
     while True:
-        rows = ClassifyMail.fetch_unclassified(db=DB_PATH, limit=CHUNK_SIZE)
+        rows = ClassifyMail.fetch_unclassified(db=db_path, limit=CHUNK_SIZE)
         if not rows:
             print("[SUCCESS] All emails are classified")
             break
 
         try:
-            classifications = ClassifyMail.classify_emails(rows)
-            ClassifyMail.update_classifications(rows, classifications, db=DB_PATH)
+            with llm_semaphore or contextlib.nullcontext():
+                classifications = ClassifyMail.classify_emails(rows)
+            ClassifyMail.update_classifications(rows, classifications, db=db_path)
             total_classified += len(rows)
+            errors = 0
             print(f"[SUCCESS] Classified {total_classified} emails so far")
         except Exception as e:
             print("[WARNING] Error classifying emails:", e)
+            errors += 1
+            if max_errors is not None and errors >= max_errors:
+                print(f"[ERROR] Giving up after {errors} failed chunks in a row")
+                break
             time.sleep(2)  # small pause before retrying
 
-    # 8. Handle NOT IMPORTANT emails
+    return total_classified
+
+
+def sort_emails(service, db_path=DB_PATH):
+    """Ask before labeling NOT IMPORTANT emails for review and before moving them to Trash."""
     print("Handling NOT IMPORTANT emails...")
     label_id = get_or_create_label(service)
     if not label_id:
         print("[ERROR] Failed to get or create review label. Exiting.")
-        return
+        return False
 
-    non_important_ids = fetch_not_important_ids(db=DB_PATH)
+    non_important_ids = fetch_not_important_ids(db=db_path)
     print(f"Total NOT IMPORTANT emails (unreviewed): {len(non_important_ids)}")
 
     if non_important_ids:
         print(f"Found {len(non_important_ids)} NOT IMPORTANT emails to process.")
         review_label = input("Move these emails to the 'Review' label in Gmail? (y/n): ")
         if review_label.lower() == 'y':
-            labeled_count = label_not_important(service, label_id, db=DB_PATH)
+            labeled_count = label_not_important(service, label_id, db=db_path)
             if labeled_count:
                 # Mark as reviewed so they are not processed again
-                mark_as_reviewed(non_important_ids, db=DB_PATH)
+                mark_as_reviewed(non_important_ids, db=db_path)
 
                 review_trash = input("Review your marked emails in Gmail! After reviewing, do you want to move these NOT IMPORTANT emails to Trash? (y/n): ")
                 if review_trash.lower() == 'y':
@@ -124,9 +119,174 @@ def main():
             print("[INFO] Aborted labeling emails.")
     else:
         print("[INFO] No NOT IMPORTANT emails to process")
+    return True
+
+
+def connect():
+    """Authenticate and return the Gmail service used by all steps."""
+    service = gmail_service()
+    service._baseUrl = "https://gmail.googleapis.com/"
+    return service
+
+
+# -----------------------
+# MAIN SCRIPT
+# -----------------------
+def run_interactive(db_path=DB_PATH):
+    """Run every step in order, asking before anything destructive."""
+    # 1. Authenticate Gmail
+    service = connect()
+
+    # 2. Initialize DB
+    if os.path.exists(db_path):
+        while True:
+            choice = input(
+                f"Database '{db_path}' already exists. What would you like to do?\n"
+                "1. Start Fresh (Deletes all existing data)\n"
+                "2. Continue with existing data\n"
+                "3. Exit\n"
+                "Enter your choice (1/2/3): "
+            ).strip()
+            if choice == '1':
+                print("Starting fresh, deleting old database...")
+                os.remove(db_path)
+                create_db(db_path)
+                break
+            elif choice == '2':
+                print(f"Continuing with existing database '{db_path}'")
+                upgrade_db(db_path)
+                break
+            elif choice == '3':
+                print("Exiting.")
+                return
+            else:
+                print("Invalid choice. Please enter 1, 2, or 3.")
+    else:
+        print(f"Database not found at '{db_path}', creating...")
+        create_db(db_path)
+
+    # 3-6. Fetch messages from Gmail and store them in the DB
+    sync_emails(service, db_path=db_path)
+
+    # 7. Classify unclassified emails in chunks
+    classify_all(db_path=db_path)
+
+    # 8. Handle NOT IMPORTANT emails
+    if not sort_emails(service, db_path=db_path):
+        return
 
     # 9. Handle Unsubscribe Links
-    handle_unsubscribing(db_name=DB_PATH)
+    handle_unsubscribing(db_name=db_path)
+
+
+# -----------------------
+# SUBCOMMANDS
+# -----------------------
+def require_db(db_path):
+    if not os.path.exists(db_path):
+        print(f"[ERROR] Database '{db_path}' not found. Run 'python3 main.py sync' first.")
+        return False
+    upgrade_db(db_path)
+    return True
+
+
+def cmd_sync(args):
+    service = connect()
+    if not os.path.exists(args.db):
+        print(f"Database not found at '{args.db}', creating...")
+        create_db(args.db)
+    else:
+        upgrade_db(args.db)
+    sync_emails(service, db_path=args.db)
+    return 0
+
+
+def cmd_classify(args):
+    if not require_db(args.db):
+        return 1
+    classify_all(db_path=args.db)
+    return 0
+
+
+def cmd_sort(args):
+    if not require_db(args.db):
+        return 1
+    return 0 if sort_emails(connect(), db_path=args.db) else 1
+
+
+def cmd_unsubscribe(args):
+    if not require_db(args.db):
+        return 1
+    if not (args.export or args.print):
+        handle_unsubscribing(db_name=args.db)
+        return 0
+
+    unsubscribe_list = get_unsubscribe_links(args.db)
+    if args.export:
+        export_to_csv(unsubscribe_list, filename=args.export)
+    if args.print:
+        print_to_terminal(unsubscribe_list)
+    return 0
+
+
+def cmd_stats(args):
+    if not require_db(args.db):
+        return 1
+    if args.rebuild:
+        print("Rebuilding sender stats from all emails...")
+        rebuild_sender_stats(args.db)
+
+    senders = get_top_senders(args.db, limit=args.top, sort=args.sort)
+    if args.format == "table":
+        stats = get_mailbox_stats(args.db)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f, contextlib.redirect_stdout(f):
+                print_stats(stats)
+                print_top_senders(senders)
+            print(f"Stats written to '{args.output}'.")
+        else:
+            print_stats(stats)
+            print_top_senders(senders)
+    else:
+        export_top_senders(senders, fmt=args.format, filename=args.output)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Clean up your Gmail inbox. Without a command, runs every step interactively."
+    )
+    parser.add_argument("--db", default=DB_PATH, help=f"SQLite database (default: {DB_PATH})")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+
+    subparsers.add_parser("sync", help="Fetch email metadata from Gmail into the database")
+    subparsers.add_parser("classify", help="Classify unclassified emails with Gemini")
+    subparsers.add_parser("sort", help="Label NOT IMPORTANT emails for review and optionally trash them")
+    unsubscribe = subparsers.add_parser("unsubscribe", help="List the unsubscribe links found in your emails")
+    unsubscribe.add_argument("--export", nargs="?", const="unsubscribe_links.csv", metavar="CSV",
+                             help="Export links to a CSV file (default: unsubscribe_links.csv)")
+    unsubscribe.add_argument("--print", action="store_true", help="Print links in the terminal")
+    stats = subparsers.add_parser("stats", help="Show a summary of the emails in the database and the top senders")
+    stats.add_argument("--top", type=int, default=20, help="Number of senders to show (default: 20)")
+    stats.add_argument("--sort", choices=SORT_COLUMNS, default="total",
+                       help="Order senders by total or NOT IMPORTANT emails (default: total)")
+    stats.add_argument("--format", choices=["table", "csv", "json"], default="table",
+                       help="Output format for the top senders (default: table)")
+    stats.add_argument("--output", metavar="FILE", help="Write the output to this file instead of stdout")
+    stats.add_argument("--rebuild", action="store_true", help="Recompute sender stats from all emails first")
+
+    args = parser.parse_args(argv)
+    commands = {
+        "sync": cmd_sync,
+        "classify": cmd_classify,
+        "sort": cmd_sort,
+        "unsubscribe": cmd_unsubscribe,
+        "stats": cmd_stats,
+    }
+    if args.command is None:
+        run_interactive(db_path=args.db)
+        return 0
+    return commands[args.command](args)
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())